@@ -1,21 +1,35 @@
-from pydantic_settings import BaseSettings
+from typing import Optional
+
+from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
 class Settings(BaseSettings):
+    model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8")
+
     # Database settings
     database_hostname: str
     database_port: str
     database_password: str
     database_name: str
     database_username: str
+    database_echo: bool = False
+    # Log statements slower than this many milliseconds (disabled when unset)
+    database_slow_query_ms: Optional[float] = None
+
+    # Connection pool settings. Keep pre-ping off behind PgBouncer in
+    # transaction mode; enable it when connecting to Postgres directly.
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_recycle: int = 60
+    db_pool_timeout: int = 30
+    db_pool_pre_ping: bool = False
+
+    # Create tables and indexes on startup (local development only)
+    auto_create_tables: bool = False
     
     # JWT settings
     secret_key: str
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
 
-    class Config:
-        env_file = ".env"
-        env_file_encoding = "utf-8"
-        
 settings = Settings()
\ No newline at end of file
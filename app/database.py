@@ -1,5 +1,8 @@
+import logging
+import time
+
 from sqlalchemy.orm import sessionmaker, Session 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from .config import settings
 
@@ -8,11 +11,35 @@ from .config import settings
 
 DATABASE_URL=f"postgresql+psycopg2://{settings.database_username}:{settings.database_password}@{settings.database_hostname}:{settings.database_port}/{settings.database_name}"
 
-engine= create_engine(DATABASE_URL, echo=True, future=True)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+logger = logging.getLogger("sqlalchemy.engine")
+logger.setLevel(logging.WARNING)
+
+engine= create_engine(
+    DATABASE_URL,
+    echo=settings.database_echo,
+    future=True,
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_recycle=settings.db_pool_recycle,
+    pool_timeout=settings.db_pool_timeout,
+    pool_pre_ping=settings.db_pool_pre_ping
+)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 Base = declarative_base()
 
 
+if settings.database_slow_query_ms is not None:
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _log_slow_query(conn, cursor, statement, parameters, context, executemany):
+        elapsed_ms = (time.perf_counter() - conn.info["query_start_time"].pop()) * 1000
+        if elapsed_ms > settings.database_slow_query_ms:
+            logger.warning("Slow query (%.1f ms): %s", elapsed_ms, statement)
+
+
 def get_db():
     db: Session = SessionLocal()
     try:
@@ -1,33 +1,61 @@
-from typing import List, Optional
+import asyncio
+import hashlib
+import threading
+from contextlib import asynccontextmanager
+from typing import List, Optional, Tuple
 from datetime import datetime
-from pathlib import Path
 
-from fastapi import FastAPI, Depends, HTTPException
-from fastapi.responses import JSONResponse, FileResponse
+import orjson
+from fastapi import FastAPI, Depends, HTTPException, Request, BackgroundTasks
+from fastapi.responses import FileResponse, ORJSONResponse, Response
 from fastapi.exceptions import RequestValidationError
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
 
 from . import models, utils, schemas
-from .database import get_db, engine
+from .config import settings
+from .database import get_db, engine, SessionLocal
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Schema setup normally runs once via scripts/init_db.py; this is for local dev
+    if settings.auto_create_tables:
+        models.create_tables(engine)
+    yield
+    await utils.close_http_client()
+
 
-models.Base.metadata.create_all(bind=engine)
 app = FastAPI(
     title="Country Currency & Exchange API",
     description="API for retrieving and managing country currencies and exchange rates",
     version="1.0.0",
-    include_in_schema=True
+    include_in_schema=True,
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
+# Bodies for errors whose payload never varies, encoded once at import
+_DATABASE_ERROR_BODY = orjson.dumps({
+    "error": "Database error",
+    "message": "An error occurred while accessing the database"
+})
+_INTERNAL_ERROR_BODY = orjson.dumps({
+    "error": "Internal server error",
+    "message": "An unexpected error occurred"
+})
+
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request, exc):
     error_details = {}
     for error in exc.errors():
         field_path = ".".join(str(loc) for loc in error["loc"] if str(loc) != "body")
-        field = field_path or "body"
-        error_details[field] = error["msg"]
+        error_details[field_path or "body"] = error["msg"]
     
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=400,
         content={
             "error": "Validation failed",
@@ -37,7 +65,7 @@ async def validation_exception_handler(request, exc):
 
 @app.exception_handler(utils.ExternalAPIError)
 async def external_api_exception_handler(request, exc):
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=503,
         content={
             "error": "External data source unavailable",
@@ -47,17 +75,15 @@ async def external_api_exception_handler(request, exc):
 
 @app.exception_handler(SQLAlchemyError)
 async def database_exception_handler(request, exc):
-    return JSONResponse(
+    return Response(
         status_code=500,
-        content={
-            "error": "Database error",
-            "message": "An error occurred while accessing the database"
-        }
+        content=_DATABASE_ERROR_BODY,
+        media_type="application/json"
     )
 
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc):
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=exc.status_code,
         content={
             "error": exc.detail,
@@ -67,12 +93,10 @@ async def http_exception_handler(request, exc):
 
 @app.exception_handler(Exception)
 async def general_exception_handler(request, exc):
-    return JSONResponse(
+    return Response(
         status_code=500,
-        content={
-            "error": "Internal server error",
-            "message": "An unexpected error occurred"
-        }
+        content=_INTERNAL_ERROR_BODY,
+        media_type="application/json"
     )
 
 @app.get("/countries/refresh")
@@ -82,109 +106,213 @@ async def get_refresh_not_allowed():
         detail="Method not allowed. Use POST to refresh countries data."
     )
 
+def _upsert_countries(db: Session, rows: List[dict], refresh_time: datetime) -> int:
+    """Upsert the refreshed rows, update the stats row, and return the total country count."""
+    if rows:
+        stmt = insert(models.Country).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[func.lower(models.Country.name)],
+            set_={key: stmt.excluded[key] for key in rows[0]}
+        )
+        db.execute(stmt)
+
+    # Counted once here so reads can use the stats row instead. The count is
+    # part of the stats statement itself, so a delete committed since the
+    # upsert above is reflected rather than overwritten.
+    total_countries = select(func.count(models.Country.id)).scalar_subquery()
+    stats = insert(models.Stats).values(
+        id=models.STATS_ID,
+        total_countries=total_countries,
+        last_refreshed_at=refresh_time
+    )
+    stats = stats.on_conflict_do_update(
+        index_elements=[models.Stats.id],
+        set_={
+            "total_countries": total_countries,
+            "last_refreshed_at": stats.excluded.last_refreshed_at
+        }
+    ).returning(models.Stats.total_countries)
+    total = db.execute(stats).scalar_one()
+    db.commit()
+    return total
+
 @app.post("/countries/refresh", response_model=schemas.StatusResponse)
 async def refresh_countries(request: Optional[schemas.RefreshRequest] = None, db: Session = Depends(get_db)):
-    countries_data = utils.fetch_country_data()
-    exchange_rates = utils.fetch_exchange_rates()
+    force = request.force if request else False
+    countries_data, exchange_rates = await asyncio.gather(
+        utils.fetch_country_data(force),
+        utils.fetch_exchange_rates(force)
+    )
     
     refresh_time = datetime.utcnow()
-    
+
+    # Key by lower-cased name so duplicates in the feed collapse to one row;
+    # Postgres rejects an upsert that touches the same row twice.
+    rows_by_name = {}
     for country_data in countries_data:
         country_dict = utils.extract_country_data(country_data, exchange_rates)
-        db_country = db.query(models.Country).filter(
-            models.Country.name.ilike(country_dict["name"])
-        ).first()
-        
-        if db_country:
-            for key, value in country_dict.items():
-                setattr(db_country, key, value)
-        else:
-            db_country = models.Country(**country_dict)
-            db.add(db_country)
-    
-    db.commit()
-    total_countries = db.query(models.Country).count()
+        if not country_dict["name"]:
+            continue
+        # One timestamp per refresh, matching the stats row and the response
+        country_dict["last_refreshed_at"] = refresh_time
+        rows_by_name[country_dict["name"].lower()] = country_dict
+    rows = list(rows_by_name.values())
+
+    # The session is synchronous; keep it off the event loop
+    total_countries = await run_in_threadpool(_upsert_countries, db, rows, refresh_time)
     
     return {"total_countries": total_countries, "last_refreshed_at": refresh_time}
 
+def _etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag.removeprefix("W/") in candidates
+
+def _data_version(db: Session) -> Tuple[int, Optional[datetime]]:
+    """Row count and latest refresh time; together they change on every write."""
+    stats = db.get(models.Stats, models.STATS_ID)
+    if stats is not None:
+        return stats.total_countries, stats.last_refreshed_at
+    # No refresh has run since the stats table was added; aggregate instead
+    return tuple(db.query(
+        func.count(models.Country.id),
+        func.max(models.Country.last_refreshed_at)
+    ).one())
+
+def _data_version_key(version: Tuple[int, Optional[datetime]]) -> str:
+    total_countries, last_refresh = version
+    return f"{total_countries}:{last_refresh and last_refresh.isoformat()}"
+
+def _data_etag(version: Tuple[int, Optional[datetime]], *parts) -> str:
+    key = ":".join(str(part) for part in (_data_version_key(version), *parts))
+    return f'W/"{hashlib.blake2b(key.encode(), digest_size=8).hexdigest()}"'
+
 @app.get("/countries", response_model=List[schemas.CountryResponse])
-async def get_countries(
+def get_countries(
+    request: Request,
+    response: Response,
     region: Optional[str] = None,
     currency: Optional[str] = None,
     sort: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
-    query = db.query(models.Country)
+    etag = _data_etag(_data_version(db), region, currency, sort)
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+
+    # Select plain columns so rows skip ORM hydration and identity-map tracking
+    query = select(*models.Country.__table__.columns)
     if region:
-        query = query.filter(models.Country.region == region)
+        query = query.where(models.Country.region == region)
     if currency:
-        query = query.filter(models.Country.currency_code == currency.upper())
+        query = query.where(models.Country.currency_code == currency.upper())
     if sort == "gdp_desc":
-        query = query.order_by(models.Country.estimated_gdp.desc())
+        query = query.order_by(models.Country.estimated_gdp.desc().nulls_last())
     elif sort == "gdp_asc":
         query = query.order_by(models.Country.estimated_gdp.asc())
     
-    return query.all()
+    result = db.execute(query.execution_options(yield_per=500))
+    return [dict(row) for row in result.mappings()]
 
-@app.get("/countries/image")
-async def get_summary_image(db: Session = Depends(get_db)):
-    image_path = Path("cache/summary.png")
-    if image_path.is_file():
-        return FileResponse(
-            str(image_path),
-            media_type="image/png",
-            filename="summary.png"
-        )
+# Let browsers and CDNs reuse the image briefly, then revalidate by ETag
+SUMMARY_IMAGE_CACHE_CONTROL = "public, max-age=300"
+
+def _summary_image_response(request: Request, etag: Optional[str], content: Optional[bytes] = None) -> Response:
+    cache_headers = {"Cache-Control": SUMMARY_IMAGE_CACHE_CONTROL}
+    if etag:
+        cache_headers["ETag"] = f'"{etag}"'
+        if _etag_matches(request, cache_headers["ETag"]):
+            return Response(status_code=304, headers=cache_headers)
+    headers = {**cache_headers, "Content-Disposition": 'attachment; filename="summary.png"'}
+    if content is not None:
+        return Response(content=content, media_type="image/png", headers=headers)
+    return FileResponse(
+        str(utils.SUMMARY_IMAGE_PATH),
+        media_type="image/png",
+        headers=headers
+    )
 
-    total_countries = db.query(models.Country).count()
+def _render_summary_image(db: Session) -> Optional[Tuple[bytes, str]]:
+    """
+    Render the summary image from the database.
+    Returns the PNG bytes and the data version key they reflect,
+    or None if there is nothing to show.
+    """
+    version = _data_version(db)
+    total_countries, last_refresh = version
     if total_countries == 0:
-        raise HTTPException(
-            status_code=404,
-            detail="Summary image not found"
-        )
+        return None
     top_gdp_countries = db.query(models.Country)\
         .filter(models.Country.estimated_gdp.isnot(None))\
-        .order_by(models.Country.estimated_gdp.desc())\
+        .order_by(models.Country.estimated_gdp.desc().nulls_last())\
         .limit(5)\
         .all()
-    
     if not top_gdp_countries:
-        raise HTTPException(
-            status_code=404,
-            detail="Summary image not found"
-        )
+        return None
 
-    last_refresh = db.query(models.Country.last_refreshed_at)\
-        .order_by(models.Country.last_refreshed_at.desc())\
-        .first()
+    data = utils.generate_summary_image(
+        total_countries,
+        [
+            {
+                "name": country.name,
+                "estimated_gdp": country.estimated_gdp
+            }
+            for country in top_gdp_countries
+        ],
+        last_refresh or datetime.utcnow()
+    )
+    return data, _data_version_key(version)
 
+_summary_image_lock = threading.Lock()
+
+def _regenerate_summary_image() -> None:
+    """Background task: re-render a stale summary image with its own session."""
+    # Concurrent requests for a stale image only need one re-render
+    if not _summary_image_lock.acquire(blocking=False):
+        return
+    db = SessionLocal()
     try:
-        utils.generate_summary_image(
-            total_countries,
-            [
-                {
-                    "name": country.name,
-                    "estimated_gdp": country.estimated_gdp
-                }
-                for country in top_gdp_countries
-            ],
-            last_refresh[0] if last_refresh else datetime.utcnow()
-        )
+        rendered = _render_summary_image(db)
+        if rendered:
+            utils.save_summary_image(*rendered)
+    finally:
+        db.close()
+        _summary_image_lock.release()
 
-        return FileResponse(
-            str(image_path),
-            media_type="image/png",
-            filename="summary.png"
-        )
+@app.get("/countries/image")
+def get_summary_image(request: Request, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+    if utils.SUMMARY_IMAGE_PATH.is_file():
+        # Serve the existing image straight away; if the data has been
+        # refreshed or a country deleted since it was rendered, re-render
+        # after responding.
+        meta = utils.load_summary_meta()
+        version = _data_version(db)
+        if version[1] is not None and meta.get("data_version") != _data_version_key(version):
+            background_tasks.add_task(_regenerate_summary_image)
+        return _summary_image_response(request, meta.get("etag"))
 
+    try:
+        rendered = _render_summary_image(db)
     except Exception:
         raise HTTPException(
             status_code=500,
             detail="Failed to generate or serve summary image"
         )
+    if not rendered:
+        raise HTTPException(
+            status_code=404,
+            detail="Summary image not found"
+        )
+    # Respond from memory; writing the cache file can wait
+    data, data_version = rendered
+    background_tasks.add_task(utils.save_summary_image, data, data_version)
+    return _summary_image_response(request, utils.summary_image_etag(data), data)
 
 @app.get("/countries/{name}", response_model=schemas.CountryResponse)
-async def get_country(name: str, db: Session = Depends(get_db)):
+def get_country(name: str, db: Session = Depends(get_db)):
     country = db.query(models.Country).filter(models.Country.name == name).first()
     if not country:
         raise HTTPException(
@@ -194,25 +322,35 @@ async def get_country(name: str, db: Session = Depends(get_db)):
     return country
 
 @app.delete("/countries/{name}")
-async def delete_country(name: str, db: Session = Depends(get_db)):
-    country = db.query(models.Country).filter(models.Country.name == name).first()
-    if not country:
+def delete_country(name: str, db: Session = Depends(get_db)):
+    # Bulk delete: one DELETE statement, no instance loaded or tracked
+    deleted = db.query(models.Country)\
+        .filter(models.Country.name == name)\
+        .delete(synchronize_session=False)
+    if not deleted:
         raise HTTPException(status_code=404, detail="Country not found")
-    db.delete(country)
+    db.query(models.Stats)\
+        .filter(models.Stats.id == models.STATS_ID)\
+        .update(
+            {models.Stats.total_countries: models.Stats.total_countries - deleted},
+            synchronize_session=False
+        )
     db.commit()
     return {"status": "success", "message": f"Country {name} deleted successfully"}
 
 @app.get("/status", response_model=schemas.StatusResponse)
-async def get_status(db: Session = Depends(get_db)):
+def get_status(request: Request, response: Response, db: Session = Depends(get_db)):
     try:
-        total_countries = db.query(models.Country).count()
-        last_refresh = db.query(models.Country.last_refreshed_at)\
-            .order_by(models.Country.last_refreshed_at.desc())\
-            .first()
+        version = _data_version(db)
+        etag = _data_etag(version)
+        if _etag_matches(request, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+        response.headers["ETag"] = etag
 
+        total_countries, last_refresh = version
         return schemas.StatusResponse(
             total_countries=total_countries,
-            last_refreshed_at=last_refresh[0] if last_refresh else None
+            last_refreshed_at=last_refresh
         )
     except Exception as e:
         raise HTTPException(
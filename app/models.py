@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, func
+from sqlalchemy import Column, Integer, String, Float, DateTime, Index, func
 from .database import Base
 
 class Country(Base):
@@ -9,7 +9,7 @@ class Country(Base):
     capital = Column(String(255), nullable=True)
     region = Column(String(255), nullable=True, index=True)
     population = Column(Integer, nullable=False)
-    currency_code = Column(String(3), nullable=True)
+    currency_code = Column(String(3), nullable=True, index=True)
     exchange_rate = Column(Float, nullable=True)
     estimated_gdp = Column(Float, nullable=True)
     flag_url = Column(String(255), nullable=True)
@@ -19,3 +19,38 @@ class Country(Base):
         server_default=func.now(),
         onupdate=func.now()
     )
+
+
+class Stats(Base):
+    """
+    Single summary row (id=1) kept current by refresh_countries and
+    delete_country, so reads avoid COUNT(*)/MAX() over countries.
+    """
+    __tablename__ = "stats"
+
+    id = Column(Integer, primary_key=True)
+    total_countries = Column(Integer, nullable=False, default=0)
+    last_refreshed_at = Column(DateTime(timezone=True), nullable=True)
+
+STATS_ID = 1
+
+
+# Case-insensitive uniqueness; also the conflict target for the bulk upsert
+# in refresh_countries.
+Index("ix_countries_name_lower", func.lower(Country.name), unique=True)
+
+# Cover the GDP sort in /countries (optionally filtered by region) and the
+# top-5 lookup for the summary image.
+Index("ix_countries_region_gdp_desc", Country.region, Country.estimated_gdp.desc().nulls_last())
+Index("ix_countries_gdp_desc", Country.estimated_gdp.desc().nulls_last())
+
+
+def create_tables(bind) -> None:
+    """
+    Create missing tables, then any indexes declared after a table
+    already existed (create_all skips indexes on existing tables).
+    """
+    Base.metadata.create_all(bind=bind)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=bind, checkfirst=True)
@@ -1,6 +1,6 @@
 from datetime import datetime
 from typing import Optional
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 class CountryBase(BaseModel):
     name: str = Field(..., description="Country name (required)")
@@ -14,14 +14,13 @@ class CountryCreate(CountryBase):
     pass
 
 class CountryResponse(CountryBase):
+    model_config = ConfigDict(from_attributes=True)
+
     id: int
     exchange_rate: Optional[float] = Field(None, description="Currency exchange rate to USD")
     estimated_gdp: Optional[float] = Field(None, description="Estimated GDP based on population and exchange rate")
     last_refreshed_at: datetime = Field(..., description="Last data refresh timestamp")
 
-    class Config:
-        from_attributes = True
-
 class StatusResponse(BaseModel):
     total_countries: int = Field(..., description="Total number of countries in database")
     last_refreshed_at: Optional[datetime] = Field(None, description="Timestamp of last data refresh")
@@ -31,12 +30,13 @@ class ErrorResponse(BaseModel):
 
 class RefreshRequest(BaseModel):
     """Schema for refresh request with validation."""
-    force: bool = Field(default=True, description="Force refresh even if data was recently updated")
-    
-    class Config:
-        from_attributes = True
-        json_schema_extra = {
+    model_config = ConfigDict(
+        from_attributes=True,
+        json_schema_extra={
             "example": {
                 "force": True
             }
-        }
\ No newline at end of file
+        }
+    )
+
+    force: bool = Field(default=False, description="Bypass cached external API responses and refetch")
\ No newline at end of file
@@ -1,21 +1,172 @@
 import os
-import requests
+import io
+import asyncio
+import contextlib
+import json
+import logging
+import tempfile
+import hashlib
+import zlib
+import time
+import threading
+import httpx
 import random
+from functools import lru_cache
 from typing import List, Dict, Any, Optional
 from datetime import datetime
-from requests.exceptions import RequestException
 from PIL import Image, ImageDraw, ImageFont
 from pathlib import Path
 
+logger = logging.getLogger(__name__)
+
 class ExternalAPIError(Exception):
     pass
 
-def fetch_country_data() -> List[Dict[str, Any]]:
+def _write_atomic(path: Path, data: bytes) -> None:
+    """
+    Write data to a uniquely named temp file next to path, then rename it
+    into place, so readers and other workers never see a partial file.
+    """
+    path.parent.mkdir(exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(tmp_path)
+        raise
+
+class TTLCache:
+    """
+    Process-local cache of upstream JSON responses keyed by URL.
+    Entries are persisted to disk so a restart reuses the last response
+    until it expires.
+    """
+
+    def __init__(self, path: Path, ttl: float):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        # Replaced rather than mutated, so _save can serialize it unlocked
+        self._entries: Dict[str, Dict[str, Any]] = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with self.path.open(encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def _save(self) -> None:
+        # The in-memory entry is already updated; a failed write only costs
+        # a refetch after restart, so it must not fail the caller.
+        with self._save_lock:
+            try:
+                _write_atomic(self.path, json.dumps(self._entries).encode("utf-8"))
+            except OSError as e:
+                logger.warning("Could not persist %s: %s", self.path, e)
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._entries.get(url)
+
+    def is_fresh(self, entry: Dict[str, Any]) -> bool:
+        return time.time() < entry.get("expires_at", 0)
+
+    def set(self, url: str, payload: Any, etag: Optional[str] = None, last_modified: Optional[str] = None) -> None:
+        entry = {
+            "expires_at": time.time() + self.ttl,
+            "etag": etag,
+            "last_modified": last_modified,
+            "payload": payload
+        }
+        with self._lock:
+            self._entries = {**self._entries, url: entry}
+        self._save()
+
+    def touch(self, url: str) -> None:
+        """Extend the expiry of an entry the upstream confirmed unchanged."""
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is None:
+                return
+            self._entries = {**self._entries, url: {**entry, "expires_at": time.time() + self.ttl}}
+        self._save()
+
+_COUNTRIES_CACHE = TTLCache(Path("cache") / "countries.json", ttl=24 * 60 * 60)
+_RATES_CACHE = TTLCache(Path("cache") / "rates.json", ttl=30 * 60)
+
+_MAX_RETRIES = 3
+_RETRY_BACKOFF = 0.2
+_RETRY_STATUSES = (502, 503, 504)
+
+# Shared across requests so connections to the upstream APIs are reused.
+# The transport retries failed connects; _get_json retries gateway errors.
+# Created on first use (and again after close_http_client) so the app can
+# go through more than one lifespan in the same process.
+_http_client: Optional[httpx.AsyncClient] = None
+
+def _get_http_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=10,
+            transport=httpx.AsyncHTTPTransport(
+                retries=_MAX_RETRIES,
+                limits=httpx.Limits(max_connections=16, max_keepalive_connections=4)
+            )
+        )
+    return _http_client
+
+async def close_http_client() -> None:
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+async def _get_json(url: str, cache: TTLCache, force: bool = False) -> Any:
+    """
+    Return the JSON body for url, served from cache while fresh.
+    Expired entries are revalidated with If-None-Match/If-Modified-Since
+    so an unchanged upstream answers 304 and the body is not re-parsed.
+    """
+    entry = cache.get(url)
+    if entry and not force and cache.is_fresh(entry):
+        return entry["payload"]
+
+    headers = {}
+    if entry:
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+    for attempt in range(_MAX_RETRIES + 1):
+        response = await _get_http_client().get(url, headers=headers)
+        if response.status_code not in _RETRY_STATUSES or attempt == _MAX_RETRIES:
+            break
+        await asyncio.sleep(_RETRY_BACKOFF * 2 ** attempt)
+
+    # Persisting serializes the whole payload; keep it off the event loop
+    if response.status_code == 304 and entry:
+        await asyncio.to_thread(cache.touch, url)
+        return entry["payload"]
+
+    response.raise_for_status()
+    payload = response.json()
+    await asyncio.to_thread(
+        cache.set, url, payload, response.headers.get("ETag"), response.headers.get("Last-Modified")
+    )
+    return payload
+
+async def fetch_country_data(force: bool = False) -> List[Dict[str, Any]]:
     url = 'https://restcountries.com/v2/all?fields=name,capital,region,population,flag,currencies'
     try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        data = response.json()
+        data = await _get_json(url, _COUNTRIES_CACHE, force)
         # API returns list of country objects directly
         if isinstance(data, list):
             return data
@@ -23,21 +174,25 @@ def fetch_country_data() -> List[Dict[str, Any]]:
     except Exception as e:
         raise ExternalAPIError(f"Could not fetch data from Countries API: {str(e)}")
 
-def fetch_exchange_rates() -> Dict[str, float]:
+async def fetch_exchange_rates(force: bool = False) -> Dict[str, float]:
     url = 'https://open.er-api.com/v6/latest/USD'
     try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        return response.json().get('rates', {})
+        data = await _get_json(url, _RATES_CACHE, force)
+        return data.get('rates', {})
     except Exception as e:
         raise ExternalAPIError(f"Could not fetch data from Exchange Rates API: {str(e)}")
 
-def compute_estimated_gdp(population: int, exchange_rate: Optional[float]) -> Optional[float]:
+@lru_cache(maxsize=None)
+def _gdp_per_capita(country_name: str) -> float:
+    # Seeded by name so a country keeps the same multiplier across refreshes,
+    # workers and restarts (the built-in hash() is salted per process).
+    return random.Random(zlib.crc32(country_name.encode("utf-8"))).uniform(1000, 2000)
+
+def compute_estimated_gdp(population: int, exchange_rate: Optional[float], country_name: str) -> Optional[float]:
     if not exchange_rate:
         return None
     
-    # Fresh random multiplier for each calculation
-    gdp_per_capita = random.uniform(1000, 2000)
+    gdp_per_capita = _gdp_per_capita(country_name)
     return (population * gdp_per_capita) / exchange_rate
 
 def extract_country_data(country_data: Dict[str, Any], exchange_rates: Dict[str, float]) -> Dict[str, Any]:
@@ -57,10 +212,11 @@ def extract_country_data(country_data: Dict[str, Any], exchange_rates: Dict[str,
     if population <= 0:
         population = 1000000  # Use a default population if missing or invalid
     
-    estimated_gdp = compute_estimated_gdp(population, exchange_rate) if exchange_rate else None
+    name = (country_data.get('name') or '').strip()
+    estimated_gdp = compute_estimated_gdp(population, exchange_rate, name) if exchange_rate else None
     
     return {
-        'name': country_data.get('name'),
+        'name': name,
         'capital': country_data.get('capital'),
         'region': country_data.get('region'),
         'population': population,
@@ -71,45 +227,81 @@ def extract_country_data(country_data: Dict[str, Any], exchange_rates: Dict[str,
         'last_refreshed_at': datetime.utcnow()
     }
 
-def generate_summary_image(total_countries: int, top_gdp_countries: List[Dict[str, Any]], last_refresh: datetime) -> str:
+# Loaded once; parsing the font file on every render is measurable
+try:
+    _FONT = ImageFont.truetype("DejaVuSans.ttf", 20)
+except OSError:
+    _FONT = ImageFont.load_default()
+
+def _build_summary_template() -> Image.Image:
+    """The static parts of the summary image, copied for each render."""
+    image = Image.new('RGB', (800, 600), 'white')
+    draw = ImageDraw.Draw(image)
+    draw.text((50, 50), "Country API Summary", fill='black', font=_FONT)
+    draw.text((50, 200), "Top 5 Countries by Estimated GDP:", fill='black', font=_FONT)
+    return image
+
+_SUMMARY_TEMPLATE = _build_summary_template()
+
+SUMMARY_IMAGE_PATH = Path("cache") / "summary.png"
+SUMMARY_META_PATH = Path("cache") / "summary.meta.json"
+
+def load_summary_meta() -> Dict[str, Any]:
+    """
+    Load the metadata written alongside the summary image:
+    the data version it was rendered from and its content ETag.
+    """
+    try:
+        with SUMMARY_META_PATH.open(encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return meta if isinstance(meta, dict) else {}
+
+def summary_image_etag(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def generate_summary_image(total_countries: int, top_gdp_countries: List[Dict[str, Any]], last_refresh: datetime) -> bytes:
     """
     Generate a summary image with country statistics
-    Returns the path to the generated image
+    Returns the PNG bytes; use save_summary_image to persist them
     """
-    # Create cache directory if it doesn't exist
-    cache_dir = Path("cache")
-    cache_dir.mkdir(exist_ok=True)
-    image_path = cache_dir / "summary.png"
-
-    # Create a new image with a white background
-    width = 800
-    height = 600
-    image = Image.new('RGB', (width, height), 'white')
+    image = _SUMMARY_TEMPLATE.copy()
     draw = ImageDraw.Draw(image)
-    
-    try:
-        font = ImageFont.truetype("DejaVuSans.ttf", 20)
-    except OSError:
-        font = ImageFont.load_default()
+    font = _FONT
 
-    # Draw title
-    draw.text((50, 50), "Country API Summary", fill='black', font=font)
-    
     # Draw statistics
     y_pos = 100
     draw.text((50, y_pos), f"Total Countries: {total_countries}", fill='black', font=font)
     draw.text((50, y_pos + 40), f"Last Refresh: {last_refresh.strftime('%Y-%m-%d %H:%M:%S UTC')}", fill='black', font=font)
     
-    # Draw top 5 countries by GDP
-    y_pos += 100
-    draw.text((50, y_pos), "Top 5 Countries by Estimated GDP:", fill='black', font=font)
-    y_pos += 40
+    # Draw top 5 countries by GDP below the heading in the template
+    y_pos += 140
     
     for country in top_gdp_countries[:5]:
         gdp_text = f"{country['name']}: ${country['estimated_gdp']:,.2f}"
         draw.text((70, y_pos), gdp_text, fill='black', font=font)
         y_pos += 30
 
-    # Save the image
-    image.save(str(image_path))
+    # Favour encode speed over size; the image is small and mostly blank
+    buf = io.BytesIO()
+    image.save(buf, format="PNG", optimize=False, compress_level=1)
+    return buf.getvalue()
+
+def save_summary_image(data: bytes, data_version: str) -> str:
+    """
+    Write a rendered summary image to the cache along with
+    the data version (country count and refresh time) it was rendered from.
+    Returns the path to the saved image
+    """
+    # Both files are swapped in whole: the image may be being served by
+    # FileResponse, or written by another worker, while this runs.
+    # Image first, so the meta never points at a render that is not there.
+    image_path = SUMMARY_IMAGE_PATH
+    _write_atomic(image_path, data)
+    meta = {
+        "data_version": data_version,
+        "etag": summary_image_etag(data)
+    }
+    _write_atomic(SUMMARY_META_PATH, json.dumps(meta).encode("utf-8"))
     return str(image_path)
\ No newline at end of file
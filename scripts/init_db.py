@@ -0,0 +1,14 @@
+"""
+Create the database tables and indexes.
+
+Run once per deployment (and after model changes) from the project root:
+
+    python -m scripts.init_db
+"""
+from app.database import engine
+from app.models import create_tables
+
+
+if __name__ == "__main__":
+    create_tables(engine)
+    print("Database tables and indexes are up to date")
@@ -0,0 +1,86 @@
+import time
+
+import httpx
+import pytest
+
+from app import utils
+
+
+URL = "https://example.test/rates"
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return utils.TTLCache(tmp_path / "rates.json", ttl=60)
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Route the shared HTTP client through a mock transport and record requests."""
+    state = {"requests": [], "response": httpx.Response(200, json={"rates": {"NGN": 1500.0}}, headers={"ETag": '"v1"'})}
+
+    def handler(request):
+        state["requests"].append(request)
+        return state["response"]
+
+    monkeypatch.setattr(utils, "_http_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    return state
+
+
+@pytest.mark.asyncio
+async def test_fresh_entry_is_served_without_a_request(cache, upstream):
+    assert await utils._get_json(URL, cache) == {"rates": {"NGN": 1500.0}}
+    assert await utils._get_json(URL, cache) == {"rates": {"NGN": 1500.0}}
+
+    assert len(upstream["requests"]) == 1
+
+
+@pytest.mark.asyncio
+async def test_expired_entry_is_revalidated_and_reused_on_304(cache, upstream):
+    cache.set(URL, {"rates": {"NGN": 1400.0}}, etag='"v1"', last_modified="Mon, 01 Jan 2024 00:00:00 GMT")
+    cache._entries[URL]["expires_at"] = time.time() - 1
+    upstream["response"] = httpx.Response(304)
+
+    assert await utils._get_json(URL, cache) == {"rates": {"NGN": 1400.0}}
+
+    request = upstream["requests"][0]
+    assert request.headers["If-None-Match"] == '"v1"'
+    assert request.headers["If-Modified-Since"] == "Mon, 01 Jan 2024 00:00:00 GMT"
+    assert cache.is_fresh(cache.get(URL))
+
+
+@pytest.mark.asyncio
+async def test_expired_entry_is_replaced_when_upstream_changed(cache, upstream):
+    cache.set(URL, {"rates": {"NGN": 1400.0}}, etag='"v0"')
+    cache._entries[URL]["expires_at"] = time.time() - 1
+
+    assert await utils._get_json(URL, cache) == {"rates": {"NGN": 1500.0}}
+    assert cache.get(URL)["etag"] == '"v1"'
+
+
+@pytest.mark.asyncio
+async def test_force_bypasses_a_fresh_entry(cache, upstream):
+    cache.set(URL, {"rates": {"NGN": 1400.0}})
+
+    assert await utils._get_json(URL, cache, force=True) == {"rates": {"NGN": 1500.0}}
+    assert len(upstream["requests"]) == 1
+
+
+@pytest.mark.asyncio
+async def test_entries_survive_a_restart(cache, upstream, tmp_path):
+    await utils._get_json(URL, cache)
+
+    reloaded = utils.TTLCache(tmp_path / "rates.json", ttl=60)
+    assert reloaded.get(URL)["payload"] == {"rates": {"NGN": 1500.0}}
+    assert list(tmp_path.iterdir()) == [tmp_path / "rates.json"]
+
+
+@pytest.mark.asyncio
+async def test_failed_disk_write_does_not_fail_the_fetch(cache, upstream, monkeypatch):
+    def fail(path, data):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(utils, "_write_atomic", fail)
+
+    assert await utils._get_json(URL, cache) == {"rates": {"NGN": 1500.0}}
+    assert cache.get(URL)["payload"] == {"rates": {"NGN": 1500.0}}
@@ -0,0 +1,28 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from app import utils
+
+
+@pytest.fixture
+def summary_paths(tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, "SUMMARY_IMAGE_PATH", tmp_path / "summary.png")
+    monkeypatch.setattr(utils, "SUMMARY_META_PATH", tmp_path / "summary.meta.json")
+    return tmp_path
+
+
+def test_save_replaces_image_and_meta_without_leaving_temp_files(summary_paths):
+    last_refresh = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    first = utils.generate_summary_image(1, [{"name": "Nigeria", "estimated_gdp": 1.0}], last_refresh)
+    second = utils.generate_summary_image(2, [{"name": "Ghana", "estimated_gdp": 2.0}], last_refresh)
+
+    utils.save_summary_image(first, "1:2026-01-01T00:00:00+00:00")
+    utils.save_summary_image(second, "2:2026-01-01T00:00:00+00:00")
+
+    assert utils.SUMMARY_IMAGE_PATH.read_bytes() == second
+    assert utils.load_summary_meta() == {
+        "data_version": "2:2026-01-01T00:00:00+00:00",
+        "etag": utils.summary_image_etag(second)
+    }
+    assert sorted(p.name for p in summary_paths.iterdir()) == ["summary.meta.json", "summary.png"]